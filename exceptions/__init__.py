@@ -1,3 +1,9 @@
-from .exceptions import JobNotFoundException, StudioException, PhotoNotFoundException
+from .exceptions import (
+    JobNotFoundException, StudioException, PhotoNotFoundException, AuthenticationException,
+    NotFoundException, ValidationException, RateLimitException, ServerException, exception_for_status
+)
 
-__all__ = ['JobNotFoundException', 'StudioException', 'PhotoNotFoundException']
+__all__ = [
+    'JobNotFoundException', 'StudioException', 'PhotoNotFoundException', 'AuthenticationException',
+    'NotFoundException', 'ValidationException', 'RateLimitException', 'ServerException', 'exception_for_status'
+]
@@ -10,3 +10,36 @@ class StudioException(Exception):
         self.status_code = status_code
         self.message = message
         super().__init__(self.message, self.status_code)
+
+class AuthenticationException(StudioException):
+    """ 401/403 - the API key is missing or invalid """
+
+class NotFoundException(StudioException):
+    """ 404 - the requested resource does not exist """
+
+class ValidationException(StudioException):
+    """ 400/422 - the request was malformed """
+
+class RateLimitException(StudioException):
+    """ 429 - too many requests, retry_after is the wait in seconds the server asked for """
+    def __init__(self, status_code, message="Studio exception occurred", retry_after=None):
+        self.retry_after = retry_after
+        super().__init__(status_code, message)
+
+class ServerException(StudioException):
+    """ 5xx - the server failed to handle the request """
+
+def exception_for_status(status_code, message="Studio exception occurred", retry_after=None):
+    """ Builds the StudioException subclass matching an HTTP status code """
+    if status_code in (401, 403):
+        return AuthenticationException(status_code, message)
+    if status_code == 404:
+        return NotFoundException(status_code, message)
+    if status_code in (400, 422):
+        return ValidationException(status_code, message)
+    if status_code == 429:
+        return RateLimitException(status_code, message, retry_after)
+    if status_code >= 500:
+        return ServerException(status_code, message)
+
+    return StudioException(status_code, message)
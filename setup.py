@@ -28,6 +28,9 @@ setup(
         "requests >= 2.0.0"
     ],
     extras_require={
+        "fast": [
+            "orjson >= 3.0.0",
+        ],
         "test": [
             "pytest >= 3.0.5",
             "pytest-cov >= 2.6.1",
@@ -0,0 +1,271 @@
+"""
+SkylabStudio - Python Client
+For more information, visit https://studio.skylabtech.ai
+"""
+
+import asyncio
+import heapq
+import inspect
+import logging
+import requests
+
+from exceptions import NotFoundException, RateLimitException, ServerException, StudioException
+
+LOGGER = logging.getLogger('skylab_studio')
+
+QUEUED_STATUS = 'queued'
+PROCESSING_STATUS = 'processing'
+TERMINAL_STATUSES = ('complete', 'completed', 'cancelled', 'canceled', 'failed')
+
+
+class JobStatusEvent:
+    """
+    A change in a watched job's status.
+
+    Attributes:
+        job_id: The watched job id.
+        previous_status (str): The last status seen, None on the first poll.
+        status (str): The new status, None if the job no longer exists or could not be polled.
+        job (Job): The job as returned by get_job, None if it no longer exists or could not be polled.
+    """
+
+    __slots__ = ('job_id', 'previous_status', 'status', 'job')
+
+    def __init__(self, job_id, previous_status, status, job):
+        self.job_id = job_id
+        self.previous_status = previous_status
+        self.status = status
+        self.job = job
+
+    def __repr__(self):
+        return f"JobStatusEvent(job_id={self.job_id!r}, {self.previous_status!r} -> {self.status!r})"
+
+
+class JobWatcher:
+    """
+    Tracks the status of many jobs from a single scheduler.
+
+    Each job is polled on its own interval: jobs with others in front of them
+    in the queue are checked through fetch_jobs_in_front and polled less often
+    the further back they are, processing jobs are polled every min_interval
+    and anything else (e.g. draft jobs) every max_interval. A job stops being
+    watched once it reaches a terminal status or is deleted.
+
+    Rate limit, server and connection errors make the job's polls back off
+    up to max_interval. Any other error (e.g. an invalid api key) is logged
+    and the job stops being watched with a None status event.
+
+    Requests go through the client, so they share its connection pool and
+    max_requests_per_second limit with everything else using it.
+
+    Status changes are passed to on_change (a function or coroutine function)
+    and can be consumed with `async for event in watcher`. Each on_change call
+    runs in its own task, so slow handlers (e.g. downloading a completed job)
+    do not hold up polling, and errors they raise are logged. run() returns
+    once every job is done and every on_change call has finished.
+
+    Args:
+        client (api): The client used to poll jobs.
+        job_ids (list): Job ids to start watching.
+        on_change (callable): Called with a JobStatusEvent for every change.
+        min_interval (float): Shortest delay in seconds between polls of a job.
+        max_interval (float): Longest delay in seconds between polls of a job.
+        seconds_per_job_in_front (float): Extra delay per job ahead in the queue.
+        max_concurrent_polls (int): Requests in flight at once.
+        terminal_statuses (tuple): Statuses after which a job is no longer polled.
+    """
+
+    def __init__(self, client, job_ids=(), on_change=None, **kwargs):
+        self.client = client
+        self.on_change = on_change
+        self.min_interval = kwargs.get('min_interval', 2)
+        self.max_interval = kwargs.get('max_interval', 60)
+        self.seconds_per_job_in_front = kwargs.get('seconds_per_job_in_front', 1)
+        self.max_concurrent_polls = kwargs.get('max_concurrent_polls', 4)
+        self.terminal_statuses = kwargs.get('terminal_statuses', TERMINAL_STATUSES)
+
+        # job id -> last seen status
+        self.statuses = {}
+
+        # heap of (due time, sequence, job id), only the latest entry of a job is live
+        self._schedule = []
+        self._scheduled = {}
+        self._intervals = {}
+        self._sequence = 0
+        self._wakeup = None
+        self._queues = []
+        self._callbacks = set()
+
+        for job_id in job_ids:
+            self.watch(job_id)
+
+    def watch(self, job_id):
+        """ Starts watching a job, it is polled straight away """
+        if job_id in self._intervals:
+            return
+
+        self._intervals[job_id] = self.min_interval
+        self._push(job_id, 0)
+
+    def unwatch(self, job_id):
+        """ Stops watching a job """
+        self._intervals.pop(job_id, None)
+        self._scheduled.pop(job_id, None)
+
+    @property
+    def watching(self):
+        return list(self._intervals)
+
+    def _push(self, job_id, delay):
+        due = asyncio.get_running_loop().time() + delay if delay else 0
+        self._sequence += 1
+        self._scheduled[job_id] = self._sequence
+        heapq.heappush(self._schedule, (due, self._sequence, job_id))
+
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def run(self):
+        """ Polls until every watched job reached a terminal status """
+        loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        in_flight = set()
+
+        try:
+            while self._schedule or in_flight or self._callbacks:
+                delay = None
+
+                if self._schedule and len(in_flight) < self.max_concurrent_polls:
+                    due, sequence, job_id = self._schedule[0]
+
+                    if self._scheduled.get(job_id) != sequence:
+                        heapq.heappop(self._schedule)
+                        continue
+
+                    delay = due - loop.time()
+                    if delay <= 0:
+                        heapq.heappop(self._schedule)
+                        in_flight.add(asyncio.ensure_future(self._poll(job_id)))
+                        continue
+
+                self._wakeup.clear()
+                wakeup = asyncio.ensure_future(self._wakeup.wait())
+                done, _ = await asyncio.wait(in_flight | self._callbacks | {wakeup}, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+                wakeup.cancel()
+
+                for task in done & in_flight:
+                    in_flight.discard(task)
+                    task.result()
+        finally:
+            for task in in_flight | self._callbacks:
+                task.cancel()
+
+            self._wakeup = None
+            for queue in self._queues:
+                queue.put_nowait(None)
+
+    async def events(self):
+        """ Runs the watcher, yielding a JobStatusEvent for every status change """
+        queue = asyncio.Queue()
+        self._queues.append(queue)
+        runner = asyncio.ensure_future(self.run())
+
+        try:
+            while True:
+                event = await queue.get()
+                if event is None:
+                    break
+                yield event
+
+            await runner
+        finally:
+            self._queues.remove(queue)
+            runner.cancel()
+
+    def __aiter__(self):
+        return self.events()
+
+    async def _poll(self, job_id):
+        loop = asyncio.get_running_loop()
+        status = self.statuses.get(job_id)
+
+        try:
+            # jobs with others ahead of them cannot have changed status yet
+            if status == QUEUED_STATUS:
+                response = await loop.run_in_executor(None, self.client.fetch_jobs_in_front, job_id)
+                try:
+                    jobs_in_front = _count_jobs_in_front(response)
+                except ValueError as e:
+                    LOGGER.warning('Polling job %s without its queue position: %s', job_id, e)
+                    jobs_in_front = 0
+
+                if jobs_in_front:
+                    self._reschedule(job_id, self.min_interval + jobs_in_front * self.seconds_per_job_in_front)
+                    return
+
+            job = await loop.run_in_executor(None, self.client.get_job, job_id)
+        except NotFoundException:
+            self._emit(job_id, None, None)
+            self.unwatch(job_id)
+            return
+        except (RateLimitException, ServerException, requests.RequestException):
+            # back off on rate limits, server and connection errors
+            self._reschedule(job_id, self._intervals.get(job_id, self.min_interval) * 2)
+            return
+        except StudioException as e:
+            # e.g. an invalid api key, polling again would fail the same way
+            LOGGER.error('Stopped watching job %s: %s', job_id, e)
+            self._emit(job_id, None, None)
+            self.unwatch(job_id)
+            return
+
+        if job.get('status') != status:
+            self._emit(job_id, job.get('status'), job)
+
+        if job.get('status') in self.terminal_statuses:
+            self.unwatch(job_id)
+        elif job.get('status') in (QUEUED_STATUS, PROCESSING_STATUS):
+            self._reschedule(job_id, self.min_interval)
+        else:
+            self._reschedule(job_id, self.max_interval)
+
+    def _reschedule(self, job_id, interval):
+        if job_id not in self._intervals:
+            return
+
+        interval = max(self.min_interval, min(interval, self.max_interval))
+        self._intervals[job_id] = interval
+        self._push(job_id, interval)
+
+    def _emit(self, job_id, status, job):
+        event = JobStatusEvent(job_id, self.statuses.get(job_id), status, job)
+        self.statuses[job_id] = status
+
+        for queue in self._queues:
+            queue.put_nowait(event)
+
+        if self.on_change is not None:
+            task = asyncio.ensure_future(self._notify(event))
+            self._callbacks.add(task)
+            task.add_done_callback(self._callbacks.discard)
+
+            if self._wakeup is not None:
+                self._wakeup.set()
+
+    async def _notify(self, event):
+        try:
+            result = self.on_change(event)
+            if inspect.isawaitable(result):
+                await result
+        except Exception:
+            LOGGER.exception('on_change failed for %r', event)
+
+
+def _count_jobs_in_front(response):
+    """ Reads the count out of a jobs_in_front response: {"jobsInFront": <int>} """
+    count = response.get('jobsInFront') if isinstance(response, dict) else None
+
+    if not isinstance(count, int) or isinstance(count, bool):
+        raise ValueError(f'Unexpected jobs_in_front response: {response!r}')
+
+    return count
@@ -0,0 +1,129 @@
+"""
+SkylabStudio - Python Client
+For more information, visit https://studio.skylabtech.ai
+"""
+
+from collections.abc import Mapping
+
+def _camel_case(name):
+    first, *rest = name.split('_')
+    return first + ''.join(word.capitalize() for word in rest)
+
+
+class StudioModel(Mapping):
+    """
+    Read-only mapping over a parsed API response.
+
+    Fields can be read as attributes, in either snake_case or the API's
+    camelCase (photo.retouched_url, photo.retouchedUrl), or by key like the
+    plain dicts previous versions returned (photo['retouchedUrl']). Nested
+    objects are wrapped in their model the first time they are accessed.
+
+    Models are Mappings but not dicts, use to_dict() to serialize them.
+    """
+
+    __slots__ = ('_data', '_nested')
+
+    # response key -> model class used to wrap the nested value
+    _nested_models = {}
+
+    def __init__(self, data):
+        self._data = data
+        self._nested = {}
+
+    def _get(self, key):
+        if key in self._nested:
+            return self._nested[key]
+
+        value = self._data[key]
+        model = self._nested_models.get(key)
+
+        if model is not None and value is not None:
+            if isinstance(value, list):
+                value = [model(item) for item in value]
+            else:
+                value = model(value)
+            self._nested[key] = value
+
+        return value
+
+    def __getattr__(self, name):
+        # only reached when regular attribute lookup fails
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        for key in (name, _camel_case(name)):
+            if key in self._data:
+                return self._get(key)
+
+        raise AttributeError(f"'{type(self).__name__}' has no field '{name}'")
+
+    def __getitem__(self, key):
+        return self._get(key)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __repr__(self):
+        return f"{type(self).__name__}(id={self._data.get('id')!r})"
+
+    def to_dict(self):
+        """ Returns the response exactly as parsed """
+        return self._data
+
+
+class Job(StudioModel):
+    """ A job returned by the job endpoints """
+    __slots__ = ()
+
+
+class Profile(StudioModel):
+    """ A profile returned by the profile endpoints """
+    __slots__ = ()
+
+
+class Photo(StudioModel):
+    """ A photo returned by the photo endpoints """
+    __slots__ = ()
+
+
+Job._nested_models = { 'profile': Profile, 'photos': Photo }
+Profile._nested_models = { 'photos': Photo }
+Photo._nested_models = { 'job': Job }
+
+
+class DownloadResult:
+    """
+    The outcome of downloading one photo.
+
+    Attributes:
+        photo_id: The photo's id.
+        file_name (str): The photo's name, None if the photo could not be fetched.
+        output_paths (list): Paths of every file written for the photo.
+        download_seconds (float): Time spent fetching the photo and its image.
+        write_seconds (float): Time spent decoding and writing the outputs.
+        error (Exception): What went wrong, None on success.
+    """
+
+    __slots__ = ('photo_id', 'file_name', 'output_paths', 'download_seconds', 'write_seconds', 'error')
+
+    def __init__(self, photo_id, file_name, output_paths=None, download_seconds=None, write_seconds=None, error=None):
+        self.photo_id = photo_id
+        self.file_name = file_name
+        self.output_paths = output_paths if output_paths is not None else []
+        self.download_seconds = download_seconds
+        self.write_seconds = write_seconds
+        self.error = error
+
+    @property
+    def success(self):
+        return self.error is None
+
+    def __repr__(self):
+        return f"DownloadResult(photo_id={self.photo_id!r}, file_name={self.file_name!r}, success={self.success})"
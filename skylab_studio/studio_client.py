@@ -15,75 +15,115 @@ import base64
 import hashlib
 import requests
 import sentry_sdk
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 from .version import VERSION
+from .models import Job, Profile, Photo, DownloadResult
+from .job_watcher import JobWatcher, JobStatusEvent
 from exceptions import *
 
 API_HEADER_KEY = 'X-SLT-API-KEY'
 API_HEADER_CLIENT = 'X-SLT-API-CLIENT'
 
+# orjson is used to parse responses when installed
+_json_loads = orjson.loads if orjson else json.loads
+
 LOGGER = logging.getLogger('skylab_studio')
 LOGGER.propagate = False
 
+SENTRY_DSN = 'https://0b5490403ee70db8bd7869af3b10380b@o1409269.ingest.us.sentry.io/4507850876452864'
+
+# Guards the process wide logging and sentry setup shared by every client
+_SETUP_LOCK = threading.Lock()
+_debug_handler = None
+_sentry_initialized = False
+
+# Largest photo the platform accepts, also the budget reserved for a download of unknown size
+MAX_PHOTO_BYTES = 27 * 1024 * 1024
+
+# Bytes per band for each pyvips band format
+_VIPS_FORMAT_BYTES = {
+    'uchar': 1, 'char': 1, 'ushort': 2, 'short': 2, 'uint': 4, 'int': 4,
+    'float': 4, 'double': 8, 'complex': 8, 'dpcomplex': 16
+}
+
 class api: #pylint: disable=invalid-name
     """
     The client for accessing the Skylab Studio platform.
 
-    Args:c   
+    A single client can be shared by any number of threads. Each thread gets
+    its own requests session, and all sessions share one connection pool of
+    up to max_connections connections per host. Configuration is read once at
+    construction and never written afterwards.
+
+    Args:
         api_key (str): Your account's API KEY.
 
     Attributes:
+        api_url (str): The Studio host, defaults to $SKYLAB_API_URL.
         api_version (str): The API endpoint version number.
         api_key (str): The API key to use.
-        debug (boolean): Whether or not to allow debugging information to be printed.
+        debug (boolean): Whether or not to allow debugging information to be printed. This enables
+            the 'skylab_studio' logger for the whole process, including other clients.
+        max_connections (int): Size of the connection pool shared by all threads.
+        max_requests_per_second (float): Rate limit shared by every API call the client makes, None for no limit.
+        max_concurrent_downloads (int): Number of photos downloaded at once by download_all_photos.
+        max_download_bytes (int): Approximate memory ceiling for photos in flight in download_all_photos,
+            covering downloaded bytes and decoded pixels.
     """
 
-    # initialization
-    try:
-        api_url = os.environ['SKYLAB_API_URL']
-    except KeyError:
-        api_url = 'https://studio.skylabtech.ai:443'
-
-    # this is not package version -> used to construct the request base url
-    api_version = '1'
-    api_key = 'THIS_IS_A_TEST_API_KEY'
-
-    debug = False
-
     def __init__(self, api_key=None, **kwargs):
         if not api_key:
             raise Exception("You must specify an api key")
 
         self.api_key = api_key
-        self.max_concurrent_downloads = 5
+        self.api_url = kwargs.get('api_url', os.environ.get('SKYLAB_API_URL', 'https://studio.skylabtech.ai:443'))
+        # this is not package version -> used to construct the request base url
+        self.api_version = kwargs.get('api_version', '1')
+        self.debug = kwargs.get('debug', False)
+        self.max_connections = kwargs.get('max_connections', 10)
+        self.max_requests_per_second = kwargs.get('max_requests_per_second')
+        self.max_concurrent_downloads = kwargs.get('max_concurrent_downloads', 5)
+        self.max_download_bytes = kwargs.get('max_download_bytes', 1024 * 1024 * 1024)
+
+        self._adapter = HTTPAdapter(pool_maxsize=self.max_connections)
+        self._local = threading.local()
+        self._rate_limiter = _RateLimiter(self.max_requests_per_second) if self.max_requests_per_second else None
 
-        if 'api_version' in kwargs:
-          self.api_version = kwargs['api_version']
+        if self.debug:
+            _enable_debug_logging()
 
-        if 'debug' in kwargs:
-            self.debug = kwargs['debug']
+    def close(self):
+        """ Closes the pooled connections used by every thread """
+        self._adapter.close()
 
-        if 'max_concurrent_downloads' in kwargs:
-            self.max_concurrent_downloads = kwargs['max_concurrent_downloads']
+    def __enter__(self):
+        return self
 
-        if self.debug:
-            logging.basicConfig(format='%(asctime)-15s %(message)s', level=logging.DEBUG)
+    def __exit__(self, *exc_info):
+        self.close()
 
-            LOGGER.debug('Debug enabled')
-            LOGGER.propagate = True
+    def _session(self):
+        """ Returns the calling thread's session, backed by the shared connection pool """
+        session = getattr(self._local, 'session', None)
 
-        # initialize sentry
-        sentry_sdk.init(
-          dsn="https://0b5490403ee70db8bd7869af3b10380b@o1409269.ingest.us.sentry.io/4507850876452864",
-          # Set traces_sample_rate to 1.0 to capture 100%
-          # of transactions for tracing.
-          traces_sample_rate=1.0,
-          # Set profiles_sample_rate to 1.0 to profile 100%
-          # of sampled transactions.
-          # We recommend adjusting this value in production.
-          profiles_sample_rate=1.0,
-          ignore_errors=[JobNotFoundException, PhotoNotFoundException]
-        )
+        if session is None:
+            session = requests.Session()
+            session.mount('https://', self._adapter)
+            session.mount('http://', self._adapter)
+            self._local.session = session
+
+        return session
 
     def _build_http_auth(self):
         return (self.api_key, '')
@@ -120,8 +160,13 @@ class api: #pylint: disable=invalid-name
 
         return json.dumps(data)
 
-    def _api_request(self, endpoint, http_method, **kwargs):
-        """Private method for api requests"""
+    def _api_request(self, endpoint, http_method, model=None, **kwargs):
+        """
+        Private method for api requests.
+
+        The response body is parsed once and wrapped in `model` when given.
+        Error responses raise the StudioException subclass matching their status.
+        """
         LOGGER.debug(' > Sending API request to endpoint: %s', endpoint)
 
         headers = self._build_request_headers()
@@ -135,45 +180,75 @@ class api: #pylint: disable=invalid-name
             data = kwargs.get('data')
         LOGGER.debug('\tdata: %s', data)
 
-        req_kw = dict(
-            headers=headers,
-        )
+        if http_method == 'DELETE':
+            data = None
+
+        if self._rate_limiter is not None:
+            self._rate_limiter.acquire()
+
+        response = self._session().request(http_method, path, data=data, headers=headers)
+
+        LOGGER.debug('\tresponse code:%s', response.status_code)
 
         try:
-          if http_method == 'POST':
-              if data:
-                  response = requests.post(path, data=data, **req_kw)
-              else:
-                  response = requests.post(path, **req_kw)
-          elif http_method == 'PATCH':
-              response = requests.patch(path, data=data, **req_kw)
-          elif http_method == 'PUT':
-              response = requests.put(path, data=data, **req_kw)
-          elif http_method == 'DELETE':
-              response = requests.delete(path, **req_kw)
-          else:
-              response = requests.get(path, data=data, **req_kw)
-
-          LOGGER.debug('\tresponse code:%s', response.status_code)
+            body = _json_loads(response.content) if response.content else None
+            LOGGER.debug('\tresponse: %s', body)
+        except ValueError:
+            body = None
+            LOGGER.debug('\tresponse: %s', response.content)
 
-          try:
-              LOGGER.debug('\tresponse: %s', response.json())
-          except ValueError:
-              LOGGER.debug('\tresponse: %s', response.content)
+        if not response.ok:
+            message = body.get('message') if isinstance(body, dict) else None
+
+            raise exception_for_status(response.status_code, message or response.text or response.reason, _retry_after(response))
+
+        if model is not None:
+            if isinstance(body, list):
+                return [model(item) for item in body]
+            if isinstance(body, dict):
+                return model(body)
 
-          if not response.ok:
-              status_code = response.status_code
-              message = response.json()['message']
+        return body
 
-              raise StudioException(status_code, message)
-        except (StudioException, Exception) as e:
-              formatted_response = {
-                  "message": e.message,
-                  "status": e.status_code
-              }
-              return formatted_response
+    def _bulk_request(self, method, ids, idempotent, max_workers=None, retries=2, max_retry_wait=60, **kwargs):
+        """
+        Calls `method` once for every distinct id on a bounded pool of threads
+        sharing the client's connection pool and rate limit.
+
+        Rate limited requests, and connection errors raised before the request
+        was sent, are retried. Server errors and other connection errors may
+        come after the server acted, so they are only retried for idempotent
+        methods. Rate limited retries wait for the server's Retry-After, ids
+        asked to wait longer than max_retry_wait seconds are not retried.
+
+        Returns a dict of id -> response, failed ids map to the exception raised.
+        """
+        ids = list(dict.fromkeys(ids))
+
+        def retryable(error):
+            if isinstance(error, RateLimitException):
+                return True
+            if idempotent:
+                return isinstance(error, (ServerException, requests.ConnectionError))
+            return isinstance(error, requests.ConnectionError) and _request_not_sent(error)
+
+        def call(item_id):
+            for attempt in range(retries + 1):
+                try:
+                    return method(item_id, **kwargs)
+                except Exception as e:
+                    if attempt == retries or not retryable(e):
+                        return e
 
-        return response.json()
+                    retry_after = getattr(e, 'retry_after', None)
+                    wait = retry_after if retry_after is not None else attempt + 1
+                    if wait > max_retry_wait:
+                        return e
+
+                    time.sleep(wait)
+
+        with ThreadPoolExecutor(max_workers=max_workers or self.max_connections) as executor:
+            return dict(zip(ids, executor.map(call, ids)))
 
     ###### JOB ENDPOINTS ######
 
@@ -181,7 +256,8 @@ class api: #pylint: disable=invalid-name
         """ API call to get all jobs """
         return self._api_request(
             'jobs',
-            'GET'
+            'GET',
+            model=Job
         )
 
     def create_job(self, payload=None):
@@ -189,6 +265,7 @@ class api: #pylint: disable=invalid-name
         return self._api_request(
             'jobs',
             'POST',
+            model=Job,
             payload=payload
         )
 
@@ -196,13 +273,15 @@ class api: #pylint: disable=invalid-name
         """ API call to get a specific job """
         return self._api_request(
             'jobs/%s' % job_id,
-            'GET'
+            'GET',
+            model=Job
         )
 
     def get_job_by_name(self, payload=None):
         return self._api_request(
             'jobs/find_by_name',
             'GET',
+            model=Job,
             payload=payload
         )
 
@@ -211,6 +290,7 @@ class api: #pylint: disable=invalid-name
         return self._api_request(
             'jobs/%s' % job_id,
             'PATCH',
+            model=Job,
             payload=payload
         )
 
@@ -218,6 +298,7 @@ class api: #pylint: disable=invalid-name
         return self._api_request(
             'jobs/%s/queue' % job_id,
             'POST',
+            model=Job,
             payload=payload
         )
 
@@ -227,27 +308,46 @@ class api: #pylint: disable=invalid-name
             'GET',
         )
 
+    def watch_jobs(self, job_ids, on_change=None, **kwargs):
+        """ Returns a JobWatcher tracking the status of many jobs, see JobWatcher for options """
+        return JobWatcher(self, job_ids, on_change, **kwargs)
+
     def delete_job(self, job_id):
         """ API call to delete a specific job """
         return self._api_request(
             'jobs/%s' % job_id,
-            'DELETE'
+            'DELETE',
+            model=Job
         )
 
     def cancel_job(self, job_id):
         """ API call to cancel a specific job """
         return self._api_request(
             'jobs/%s/cancel' % job_id,
-            'POST'
+            'POST',
+            model=Job
         )
     
+    def queue_jobs(self, job_ids, payload=None, **kwargs):
+        """ Queues many jobs concurrently, returns {job_id: job or exception} """
+        return self._bulk_request(self.queue_job, job_ids, False, payload=payload, **kwargs)
+
+    def delete_jobs(self, job_ids, **kwargs):
+        """ Deletes many jobs concurrently, returns {job_id: response or exception} """
+        return self._bulk_request(self.delete_job, job_ids, True, **kwargs)
+
+    def cancel_jobs(self, job_ids, **kwargs):
+        """ Cancels many jobs concurrently, returns {job_id: response or exception} """
+        return self._bulk_request(self.cancel_job, job_ids, False, **kwargs)
+
     ###### PROFILE ENDPOINTS ######
 
     def list_profiles(self):
         """ API call to get all profiles """
         return self._api_request(
             'profiles',
-            'GET'
+            'GET',
+            model=Profile
         )
 
     def create_profile(self, payload=None):
@@ -255,6 +355,7 @@ class api: #pylint: disable=invalid-name
         return self._api_request(
             'profiles',
             'POST',
+            model=Profile,
             payload=payload
         )
 
@@ -262,7 +363,8 @@ class api: #pylint: disable=invalid-name
         """ API call to get a specific profile """
         return self._api_request(
             'profiles/%s' % profile_id,
-            'GET'
+            'GET',
+            model=Profile
         )
 
     def update_profile(self, profile_id, payload=None):
@@ -270,6 +372,7 @@ class api: #pylint: disable=invalid-name
         return self._api_request(
             'profiles/%s' % profile_id,
             'PATCH',
+            model=Profile,
             payload=payload
         )
 
@@ -284,6 +387,7 @@ class api: #pylint: disable=invalid-name
         return self._api_request(
             'photos',
             'POST',
+            model=Photo,
             payload=payload
         )
 
@@ -300,7 +404,7 @@ class api: #pylint: disable=invalid-name
             raise Exception('Invalid file type: must be of type jpg/jpeg/png/webp')
 
         file_size = os.path.getsize(photo_path)
-        if file_size > 27 * 1024 * 1024:
+        if file_size > MAX_PHOTO_BYTES:
             raise Exception('Invalid file size: must be no larger than 27MB')
 
         photo_name = os.path.basename(photo_path)
@@ -315,20 +419,19 @@ class api: #pylint: disable=invalid-name
         photo_data = { f"{model}_id": id, "name": photo_name, "use_cache_upload": False }
 
         if model == 'job':
-            job = self.get_job(id)
-            if "type" in job:
-                job_type = job['type']
-                if job_type == 'regular':
-                    headers = { 'X-Amz-Tagging': 'job=photo&api=true' }
-            else:
-                raise JobNotFoundException(f"Unable to find job with id: {id}")
+            try:
+                job = self.get_job(id)
+            except NotFoundException as e:
+                raise JobNotFoundException(f"Unable to find job with id: {id}") from e
 
+            if job.get('type') == 'regular':
+                headers = { 'X-Amz-Tagging': 'job=photo&api=true' }
 
         # Ask studio to create the photo record
-        photo_resp = self._create_photo(photo_data)
-
-        if not 'id' in photo_resp:
-            raise Exception('Unable to create the photo object, if creating profile photo, ensure enable_extract and replace_background is set to: True')
+        try:
+            photo_resp = self._create_photo(photo_data)
+        except ValidationException as e:
+            raise ValidationException(e.status_code, f'{e.message} - Unable to create the photo object, if creating profile photo, ensure enable_extract and replace_background is set to: True') from e
 
         photo_id = photo_resp['id']
         res['photo'] = photo_resp
@@ -351,7 +454,7 @@ class api: #pylint: disable=invalid-name
         while retry < 3:
           try:
             # attempt to upload the photo to aws
-            upload_photo_resp = requests.put(upload_url, data, headers=headers)
+            upload_photo_resp = self._session().put(upload_url, data, headers=headers)
 
             # Will raise exception for any statuses 4xx-5xx
             upload_photo_resp.raise_for_status()
@@ -379,7 +482,8 @@ class api: #pylint: disable=invalid-name
         """ API call to get a specific photo """
         return self._api_request(
             'photos/%s' % photo_id,
-            'GET'
+            'GET',
+            model=Photo
         )
 
     def get_job_photos(self, job_identifier, value):
@@ -393,6 +497,7 @@ class api: #pylint: disable=invalid-name
         return self._api_request(
             'photos/list_for_job',
             'GET',
+            model=Photo,
             payload=payload
         )
 
@@ -400,9 +505,14 @@ class api: #pylint: disable=invalid-name
         """ API call to delete a specific photo """
         return self._api_request(
             'photos/%s' % photo_id,
-            'DELETE'
+            'DELETE',
+            model=Photo
         )
 
+    def delete_photos(self, photo_ids, **kwargs):
+        """ Deletes many photos concurrently, returns {photo_id: response or exception} """
+        return self._bulk_request(self.delete_photo, photo_ids, True, **kwargs)
+
     def validate_hmac_headers(self, secret_key, job_json, request_timestamp, signature):
         message=f"{request_timestamp}:{job_json}".encode('utf-8')
 
@@ -438,119 +548,426 @@ class api: #pylint: disable=invalid-name
         except aiohttp.ClientError as ex:
             print(f'Error downloading image: {ex}')
             return None
-    
-    async def _download_replaced_bg_image(self, file_name, input_image, output_path, profile = None, bgs = None):
-        try:
-            output_file_type = profile["outputFileType"] if profile else "png"
 
-            if bgs is None and profile and profile.get("photos"):
-                bgs = await self._download_bg_images(profile)
-
-            alpha_channel = input_image[3]
-            rgb_channel = input_image[0:3]
-            rgb_cutout = rgb_channel.bandjoin(alpha_channel)
-
-            if bgs and len(bgs) > 0:
-                for i, bg_image in enumerate(bgs):
-                    new_file_name = f"{os.path.splitext(file_name)[0]} ({i + 1}).{output_file_type}" if i > 0 else f"{os.path.splitext(file_name)[0]}.{output_file_type}"
-                    resized_bg_image = bg_image.thumbnail_image(input_image.width, height=input_image.height, crop=pyvips.Interesting.CENTRE)
-                    result_image = resized_bg_image.composite2(rgb_cutout, pyvips.BlendMode.OVER)
-                    result_image.write_to_file(os.path.join(output_path, new_file_name))
+    async def _fetch_photo(self, session, photo_id, profile = None, budget = None):
+        """
+        Downloads a photo's output image and decodes its header.
 
-            return True
-        except Exception as ex:
-            print(f"Error downloading background image: {ex}")
-            return False
+        When a budget is given, memory for the largest possible photo is
+        reserved before the request is sent, so no connection sits open while
+        waiting for admission. The reservation is trimmed to the response size
+        once the headers arrive, then adjusted to cover the decoded pixels
+        before the photo is handed to the write stage.
+        """
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        try:
+            photo = await loop.run_in_executor(None, self.get_photo, photo_id)
+        except NotFoundException as e:
+            raise PhotoNotFoundException(f"Unable to find photo with id: {photo_id}") from e
 
-    async def download_all_photos(self, photos_list, profile, output_path):
-        if not os.path.exists(output_path):
-            raise Exception("Invalid output path")
-
-        success_photos = []
-        errored_photos = []
-        bgs = []
+        item = { 'photo_id': photo_id, 'file_name': photo['name'], 'image': None, 'profile': profile, 'reserved': 0, 'error': None }
 
         try:
-            # Ensure the profile has photos and download background images
-            profile = self.get_profile(profile['id'])
-            if profile['photos']:
-                bgs = await self._download_bg_images(profile)
-
-            photo_ids = [photo["id"] for photo in photos_list]
-            photo_options = {
-                'bgs': bgs
-            }
-            download_tasks = []
-            semaphore = asyncio.Semaphore(self.max_concurrent_downloads)
-
-            for photo_id in photo_ids:
-                download_tasks.append(self.download_photo(photo_id, output_path, profile, photo_options, semaphore))
-
-            # Wait for all download tasks to complete
-            results = await asyncio.gather(*download_tasks)
-            for result in results:
-                if result[1]:
-                    success_photos.append(result[0])
+            if profile is None:
+                item['profile'] = await loop.run_in_executor(None, self.get_profile, photo['job']['profileId'])
+
+            image_url = photo['retouchedUrl']
+            if not image_url.lower().startswith("http"):
+                raise Exception(f'Invalid retouchedUrl: "{image_url}" - Please ensure the job is complete')
+
+            if budget is not None:
+                item['reserved'] = await budget.acquire(MAX_PHOTO_BYTES)
+
+            async with session.get(image_url) as response:
+                response.raise_for_status()
+                if budget is not None and response.content_length and response.content_length < item['reserved']:
+                    await budget.release(item['reserved'] - response.content_length)
+                    item['reserved'] = response.content_length
+                image_buffer = await response.read()
+
+            # pyvips only reads the header here, pixels are decoded on write
+            item['image'] = pyvips.Image.new_from_buffer(image_buffer, "")
+
+            if budget is not None:
+                is_composite = item['profile'].get('enableExtract', False) and item['profile'].get('replaceBackground', False)
+                needed = len(image_buffer) + _estimate_decoded_bytes(item['image'], is_composite) - item['reserved']
+                if needed > 0:
+                    item['reserved'] += await budget.acquire(needed, held=item['reserved'])
                 else:
-                    errored_photos.append(result[0])
+                    await budget.release(-needed)
+                    item['reserved'] += needed
+        except Exception as e:
+            print(f"Failed to download photo id: {photo_id}")
+            print(e)
+            item['error'] = e
 
-            return { 'success_photos': success_photos, 'errored_photos': errored_photos }
+        item['download_seconds'] = time.monotonic() - started
+        return item
 
-        except Exception as e:
-            print("Error has occurred whilst downloading photos:", e)
+    def _write_replaced_bg_image(self, file_name, input_image, output_path, profile = None, bgs = None):
+        """ Composites the extracted image over each background, returns the written paths """
+        output_paths = []
+        output_file_type = profile["outputFileType"] if profile else "png"
 
-            return { 'success_photos': success_photos, 'errored_photos': errored_photos }
+        alpha_channel = input_image[3]
+        rgb_channel = input_image[0:3]
+        rgb_cutout = rgb_channel.bandjoin(alpha_channel)
 
-    async def download_photo(self, photo_id, output_path, profile = None, options = {}, semaphore = None):
-        if not os.path.exists(output_path):
-            raise Exception("Invalid output path")
-        elif semaphore != None:
-            await semaphore.acquire()
+        if bgs and len(bgs) > 0:
+            for i, bg_image in enumerate(bgs):
+                new_file_name = f"{os.path.splitext(file_name)[0]} ({i + 1}).{output_file_type}" if i > 0 else f"{os.path.splitext(file_name)[0]}.{output_file_type}"
+                resized_bg_image = bg_image.thumbnail_image(input_image.width, height=input_image.height, crop=pyvips.Interesting.CENTRE)
+                result_image = resized_bg_image.composite2(rgb_cutout, pyvips.BlendMode.OVER)
+                output_paths.append(os.path.join(output_path, new_file_name))
+                result_image.write_to_file(output_paths[-1])
 
-        photo = self.get_photo(photo_id)
+        return output_paths
 
-        if not 'job' in photo:
-            raise PhotoNotFoundException(f"Unable to find photo with id: {photo_id}")
-        profile_id = photo['job']['profileId']
-        file_name = photo['name']
+    def _write_photo(self, item, output_path, bgs = None):
+        """ Writes a fetched photo to the output path, returns its DownloadResult """
+        result = DownloadResult(item['photo_id'], item['file_name'], download_seconds=item.get('download_seconds'), error=item['error'])
 
-        try:
-            if profile is None:
-                profile = self.get_profile(profile_id)
+        if result.error is not None:
+            return result
 
+        started = time.monotonic()
+        file_name = item['file_name']
+        # the image is dropped along with this frame once written
+        image = item.pop('image')
+
+        try:
+            profile = item['profile']
             is_extract = bool(profile.get('enableExtract', False))
             replace_background = bool(profile.get('replaceBackground', False))
             is_dual_file_output = bool(profile.get('dualFileOutput', False))
             enable_strip_png_metadata = bool(profile.get('enableStripPngMetadata', False))
-            bgs = options.get('bgs') if options else None
-
-            # Load output image
-            image_buffer = await self._download_image(photo['retouchedUrl'])
-            image = pyvips.Image.new_from_buffer(image_buffer, "")
 
             if is_extract:  # Output extract image
-                png_file_name = f"{os.path.splitext(file_name)[0]}.png"
+                png_file_path = os.path.join(output_path, f"{os.path.splitext(file_name)[0]}.png")
 
                 # Dual File Output will provide an image in the format specified in the outputFileType field
                 # and an extracted image as a PNG.
                 if is_dual_file_output:
-                    image.write_to_file(os.path.join(output_path, png_file_name))
+                    image.write_to_file(png_file_path)
+                    result.output_paths.append(png_file_path)
 
                 if replace_background:
-                    await self._download_replaced_bg_image(file_name, image, output_path, profile, bgs)
+                    result.output_paths.extend(self._write_replaced_bg_image(file_name, image, output_path, profile, bgs))
 
                 # Regular Extract output
                 if not is_dual_file_output and not replace_background:
-                    image.write_to_file(os.path.join(output_path, png_file_name))
+                    image.write_to_file(png_file_path)
+                    result.output_paths.append(png_file_path)
             else:  # Non-extracted regular image output
                 image.write_to_file(os.path.join(output_path, file_name))
+                result.output_paths.append(os.path.join(output_path, file_name))
 
             print(f"Successfully downloaded: {file_name}")
-            return file_name, True
         except Exception as e:
-            print(f"Failed to download photo id: {photo_id}")
+            print(f"Failed to download photo id: {item['photo_id']}")
             print(e)
-            return file_name, False
+            result.error = e
+
+        result.write_seconds = time.monotonic() - started
+        return result
+
+    async def iter_download_photos(self, photos_list, profile, output_path):
+        """
+        Downloads photos like download_all_photos, yielding a DownloadResult for
+        each photo as soon as it has been written, in completion order.
+
+        Photos go through two stages joined by bounded queues: fetch workers
+        download the output images, write workers decode and save them. Both
+        stages share a memory budget of max_download_bytes, and the workers
+        pause whenever the consumer has not taken the last result yet.
+
+        Closing the generator (aclose(), or leaving an `async with aclosing(...)`
+        block) or cancelling the consumer cancels the remaining downloads and
+        waits for writes already in progress. Merely breaking out of the loop
+        pauses the workers until the generator is garbage collected.
+        """
+        if not os.path.exists(output_path):
+            raise Exception("Invalid output path")
+
+        # Ensure the profile has photos and download background images
+        profile = self.get_profile(profile['id'])
+        bgs = await self._download_bg_images(profile) if profile['photos'] else None
+
+        loop = asyncio.get_running_loop()
+        budget = _MemoryBudget(self.max_download_bytes)
+        pending = asyncio.Queue()
+        fetched = asyncio.Queue(maxsize=self.max_concurrent_downloads)
+        results = asyncio.Queue(maxsize=1)
+
+        for photo in photos_list:
+            pending.put_nowait(photo["id"])
+
+        async def fetch_worker(session):
+            while True:
+                try:
+                    photo_id = pending.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+
+                try:
+                    item = await self._fetch_photo(session, photo_id, profile, budget)
+                except Exception as e:
+                    print(f"Failed to download photo id: {photo_id}")
+                    print(e)
+                    item = { 'photo_id': photo_id, 'file_name': None, 'image': None, 'profile': profile, 'reserved': 0, 'error': e }
+
+                await fetched.put(item)
+                # the writer owns the photo now, don't keep its image alive through the next fetch
+                item = None
+
+        async def write_worker():
+            while True:
+                item = await fetched.get()
+                if item is None:
+                    return
+
+                # only the write holds the photo, so its memory is freed before the budget is released
+                reserved = item['reserved']
+                write = loop.run_in_executor(None, self._write_photo, item, output_path, bgs)
+                item = None
+
+                try:
+                    result = await asyncio.shield(write)
+                except asyncio.CancelledError:
+                    # the executor cannot stop a write midway, wait for it so no file appears after closing
+                    await write
+                    raise
+                finally:
+                    await budget.release(reserved)
+
+                await results.put(result)
+
+        async def run_pipeline():
+            try:
+                await asyncio.gather(*fetchers)
+                for _ in writers:
+                    await fetched.put(None)
+                await asyncio.gather(*writers)
+            except Exception:
+                await results.put(None)
+                raise
+
+            await results.put(None)
+
+        async with aiohttp.ClientSession() as session:
+            fetchers = [asyncio.ensure_future(fetch_worker(session)) for _ in range(self.max_concurrent_downloads)]
+            writers = [asyncio.ensure_future(write_worker()) for _ in range(self.max_concurrent_downloads)]
+            pipeline = asyncio.ensure_future(run_pipeline())
+
+            try:
+                while True:
+                    result = await results.get()
+                    if result is None:
+                        break
+                    yield result
+
+                await pipeline
+            finally:
+                tasks = fetchers + writers + [pipeline]
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def download_all_photos(self, photos_list, profile, output_path):
+        if not os.path.exists(output_path):
+            raise Exception("Invalid output path")
+
+        success_photos = []
+        errored_photos = []
+
+        try:
+            async for result in self.iter_download_photos(photos_list, profile, output_path):
+                if result.success:
+                    success_photos.append(result.file_name)
+                else:
+                    errored_photos.append(result.file_name or str(result.photo_id))
+
+            return { 'success_photos': success_photos, 'errored_photos': errored_photos }
+
+        except Exception as e:
+            print("Error has occurred whilst downloading photos:", e)
+
+            return { 'success_photos': success_photos, 'errored_photos': errored_photos }
+
+    async def download_photo(self, photo_id, output_path, profile = None, options = {}, semaphore = None):
+        if not os.path.exists(output_path):
+            raise Exception("Invalid output path")
+        elif semaphore != None:
+            await semaphore.acquire()
+
+        try:
+            async with aiohttp.ClientSession() as session:
+                item = await self._fetch_photo(session, photo_id, profile)
+
+            bgs = options.get('bgs') if options else None
+            profile = item['profile']
+            if bgs is None and item['error'] is None and profile.get('replaceBackground', False) and profile.get('photos'):
+                bgs = await self._download_bg_images(profile)
+
+            result = self._write_photo(item, output_path, bgs)
+            return result.file_name, result.success
         finally:
             if semaphore != None:
                 semaphore.release()
+
+
+def _retry_after(response):
+    """ Seconds to wait from a Retry-After header, given in seconds or as an HTTP date """
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+
+    try:
+        return max(0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        return max(0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _request_not_sent(error):
+    """ Whether a connection error happened before the request reached the server """
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+def _enable_debug_logging():
+    """
+    Prints the package's debug output, without touching the root logger.
+    The handler and level stay on the 'skylab_studio' logger for the rest
+    of the process.
+    """
+    global _debug_handler
+
+    with _SETUP_LOCK:
+        if _debug_handler is None:
+            _debug_handler = logging.StreamHandler()
+            _debug_handler.setFormatter(logging.Formatter('%(asctime)-15s %(message)s'))
+            LOGGER.addHandler(_debug_handler)
+            LOGGER.setLevel(logging.DEBUG)
+
+            LOGGER.debug('Debug enabled')
+
+
+def init_error_reporting():
+    """
+    Opts in to reporting client errors to Skylab through Sentry.
+
+    This initializes the process wide Sentry SDK, so it is never done when
+    a client is created. It is a no-op after the first call, or if the
+    application already set up Sentry itself.
+    """
+    global _sentry_initialized
+
+    with _SETUP_LOCK:
+        if _sentry_initialized or sentry_sdk.get_client().is_active():
+            return
+
+        sentry_sdk.init(
+          dsn=SENTRY_DSN,
+          # Set traces_sample_rate to 1.0 to capture 100%
+          # of transactions for tracing.
+          traces_sample_rate=1.0,
+          # Set profiles_sample_rate to 1.0 to profile 100%
+          # of sampled transactions.
+          # We recommend adjusting this value in production.
+          profiles_sample_rate=1.0,
+          ignore_errors=[JobNotFoundException, PhotoNotFoundException]
+        )
+        _sentry_initialized = True
+
+
+class _RateLimiter:
+    """
+    Token bucket limiting the requests a client sends per second, shared
+    by every thread using the client. Bursts of up to one second's worth
+    of requests go out immediately.
+    """
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.capacity = max(1, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """ Blocks until the caller may send a request """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+            # take the token now and sleep off any debt outside the lock
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+
+        if wait:
+            time.sleep(wait)
+
+
+def _estimate_decoded_bytes(image, is_composite = False):
+    """ Approximates the memory needed to decode an image and, if needed, composite it """
+    decoded_bytes = image.width * image.height * image.bands * _VIPS_FORMAT_BYTES.get(image.format, 4)
+
+    # Composites hold a resized background plus the blended RGBA result at a time
+    if is_composite:
+        decoded_bytes += image.width * image.height * 4 * 2
+
+    return decoded_bytes
+
+
+class _MemoryBudget:
+    """
+    Admission control on the approximate number of bytes held in memory by
+    the download pipeline.
+
+    A reservation waits until it fits in the limit. If every holder is itself
+    waiting for more memory, nothing would ever be released, so one of them is
+    let through and the limit is briefly exceeded by a single photo.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.used = 0
+        self._stalled = 0
+        self._condition = asyncio.Condition()
+
+    def _fits(self, nbytes, held):
+        if self.used + nbytes <= self.limit:
+            return True
+
+        # prefer photos already in flight over admitting new ones
+        return self.used == self._stalled and (held > 0 or self.used == 0)
+
+    async def acquire(self, nbytes, held = 0):
+        """ Reserves nbytes, held is what the caller has already reserved """
+        async with self._condition:
+            if not self._fits(nbytes, held):
+                self._stalled += held
+                self._condition.notify_all()
+                try:
+                    await self._condition.wait_for(lambda: self._fits(nbytes, held))
+                finally:
+                    self._stalled -= held
+
+            self.used += nbytes
+
+        return nbytes
+
+    async def release(self, nbytes):
+        async with self._condition:
+            self.used -= nbytes
+            self._condition.notify_all()
@@ -2,12 +2,19 @@
 Tests for SkylabStudio - Python Client
 """
 
+import asyncio
 import pytest
 import requests
+import requests_mock
+import threading
+import time
 import uuid
 import os
 import skylab_studio
 
+from concurrent.futures import ThreadPoolExecutor
+from exceptions import AuthenticationException, JobNotFoundException, NotFoundException, RateLimitException, ServerException, ValidationException
+
 #pylint: disable=redefined-outer-name
 
 job_id = 0
@@ -69,6 +76,258 @@ def test_get_job(api):
     result = api.get_job(job_id)
     assert result is not None
 
+def test_get_job_not_found(api):
+    with pytest.raises(NotFoundException):
+        api.get_job(0)
+
+def test_job_model():
+    job = skylab_studio.Job({'id': 1, 'profile': {'enableExtract': True}, 'photos': [{'retouchedUrl': 'url'}]})
+
+    assert job.id == job['id'] == 1
+    assert job.profile.enable_extract is True
+    assert job.photos[0].retouched_url == 'url'
+    assert job.profile is job.profile
+    assert 'type' not in job
+    assert job == job.to_dict()
+    assert dict(job.photos[0]) == {'retouchedUrl': 'url'}
+
+def test_job_watcher():
+    """ Test the watcher emits each status change once and stops at a terminal status. """
+    class Client:
+        statuses = ['queued', 'processing', 'processing', 'complete']
+
+        def get_job(self, job_id):
+            return skylab_studio.Job({'id': job_id, 'status': self.statuses.pop(0)})
+
+        def fetch_jobs_in_front(self, job_id):
+            return {'jobsInFront': 0}
+
+    async def run():
+        watcher = skylab_studio.JobWatcher(Client(), [1], min_interval=0.01)
+        return [(event.previous_status, event.status) async for event in watcher]
+
+    assert asyncio.run(run()) == [(None, 'queued'), ('queued', 'processing'), ('processing', 'complete')]
+
+def test_job_watcher_jobs_in_front():
+    """ Test queued jobs with others in front are not polled through get_job. """
+    class Client:
+        statuses = ['queued', 'processing', 'complete']
+        jobs_in_front = [2, 1, 0]
+        get_job_calls = 0
+
+        def get_job(self, job_id):
+            self.get_job_calls += 1
+            return skylab_studio.Job({'id': job_id, 'status': self.statuses.pop(0)})
+
+        def fetch_jobs_in_front(self, job_id):
+            return {'jobsInFront': self.jobs_in_front.pop(0)}
+
+    client = Client()
+    watcher = skylab_studio.JobWatcher(client, [1], min_interval=0.01, seconds_per_job_in_front=0.01)
+    asyncio.run(watcher.run())
+
+    assert client.jobs_in_front == []
+    assert client.get_job_calls == 3
+    assert watcher.statuses == {1: 'complete'}
+
+def test_job_watcher_callbacks():
+    """ Test slow or failing on_change handlers neither block polling nor stop the watcher. """
+    class Client:
+        def get_job(self, job_id):
+            return skylab_studio.Job({'id': job_id, 'status': 'complete'})
+
+    handled = []
+
+    async def on_change(event):
+        await asyncio.sleep(0.5)
+        handled.append(event.job_id)
+        raise Exception('handler failed')
+
+    async def run():
+        watcher = skylab_studio.JobWatcher(Client(), range(8), on_change, max_concurrent_polls=1)
+        await asyncio.wait_for(watcher.run(), 2)
+
+    asyncio.run(run())
+
+    assert sorted(handled) == list(range(8))
+
+def test_job_watcher_errors():
+    """ Test the watcher backs off on server errors but stops watching jobs it cannot poll. """
+    class Client:
+        server_errors = 2
+        get_job_calls = 0
+
+        def get_job(self, job_id):
+            self.get_job_calls += 1
+            if job_id == 1:
+                raise AuthenticationException(401, 'Invalid api key')
+            if self.server_errors:
+                self.server_errors -= 1
+                raise ServerException(503, 'Unavailable')
+            return skylab_studio.Job({'id': job_id, 'status': 'complete'})
+
+    async def run():
+        watcher = skylab_studio.JobWatcher(Client(), [1, 2], min_interval=0.01)
+        events = [(event.job_id, event.status) async for event in watcher]
+        return watcher, events
+
+    watcher, events = asyncio.run(asyncio.wait_for(run(), 2))
+
+    assert sorted(events) == [(1, None), (2, 'complete')]
+    assert watcher.watching == []
+    assert watcher.client.get_job_calls == 4
+
+def download_client(tmp_path, write_seconds):
+    """ Returns a client whose photo fetches and writes are stubbed, recording each call. """
+    client = skylab_studio.api('KEY', max_concurrent_downloads=3)
+    client.fetched = []
+    client.written = []
+
+    client.get_profile = lambda profile_id: skylab_studio.Profile({'id': profile_id, 'photos': []})
+
+    async def fetch_photo(session, photo_id, profile=None, budget=None):
+        client.fetched.append(photo_id)
+        return { 'photo_id': photo_id, 'file_name': f"{photo_id}.jpg", 'image': None, 'profile': profile, 'reserved': 0, 'error': None }
+
+    def write_photo(item, output_path, bgs=None):
+        time.sleep(write_seconds(item['photo_id']))
+        client.written.append(item['photo_id'])
+        return skylab_studio.DownloadResult(item['photo_id'], item['file_name'])
+
+    client._fetch_photo = fetch_photo
+    client._write_photo = write_photo
+    return client
+
+def test_iter_download_photos_completion_order(tmp_path):
+    """ Test results are yielded as each photo finishes, not in input order. """
+    client = download_client(tmp_path, lambda photo_id: photo_id / 10)
+
+    async def run():
+        photos = [{'id': 3}, {'id': 1}, {'id': 2}]
+        return [result.photo_id async for result in client.iter_download_photos(photos, {'id': 1}, str(tmp_path))]
+
+    assert asyncio.run(run()) == [1, 2, 3]
+
+def test_iter_download_photos_early_stop(tmp_path):
+    """ Test breaking out of the loop pauses the workers and closing stops them. """
+    client = download_client(tmp_path, lambda photo_id: 0.01)
+
+    async def run():
+        photos = [{'id': i} for i in range(40)]
+        results = client.iter_download_photos(photos, {'id': 1}, str(tmp_path))
+
+        async for result in results:
+            break
+
+        await asyncio.sleep(0.5)
+        paused = len(client.written)
+
+        await results.aclose()
+        closed = len(client.written)
+
+        await asyncio.sleep(0.2)
+        return paused, closed
+
+    paused, closed = asyncio.run(run())
+
+    assert paused < 40
+    assert closed == len(client.written)
+    assert len(client.fetched) < 40
+
+def test_download_memory_budget():
+    """ Reservations larger than the budget run one at a time instead of deadlocking. """
+    async def run():
+        budget = skylab_studio.studio_client._MemoryBudget(10)
+
+        async def reserve():
+            held = await budget.acquire(8)
+            held += await budget.acquire(8, held=held)
+            await asyncio.sleep(0)
+            await budget.release(held)
+
+        await asyncio.wait_for(asyncio.gather(*[reserve() for _ in range(5)]), 5)
+        return budget.used
+
+    assert asyncio.run(run()) == 0
+
+def test_download_pipeline_memory_limit(tmp_path, monkeypatch):
+    """ Test downloaded bytes plus decoded pixels in flight stay within max_download_bytes. """
+    mb = 1024 * 1024
+    usage = {'bytes': 0, 'peak': 0}
+    lock = threading.Lock()
+
+    def track(nbytes):
+        with lock:
+            usage['bytes'] += nbytes
+            usage['peak'] = max(usage['peak'], usage['bytes'])
+
+    class Image:
+        width, height, bands, format = 2048, 2048, 4, 'uchar'
+
+        def __init__(self, buffer):
+            self.buffer = buffer
+            track(len(buffer))
+
+        def __del__(self):
+            track(-len(self.buffer))
+
+        def write_to_file(self, path):
+            # pixels are only decoded while writing
+            track(16 * mb)
+            time.sleep(0.02)
+            track(-16 * mb)
+
+    class Response:
+        content_length = 8 * mb
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc_info):
+            pass
+
+        def raise_for_status(self):
+            pass
+
+        async def read(self):
+            await asyncio.sleep(0.01)
+            return bytes(self.content_length)
+
+    class Session:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc_info):
+            pass
+
+        def get(self, url):
+            return Response()
+
+    monkeypatch.setattr(skylab_studio.studio_client.aiohttp, 'ClientSession', Session)
+    monkeypatch.setattr(skylab_studio.studio_client.pyvips.Image, 'new_from_buffer', staticmethod(lambda buffer, options: Image(buffer)))
+
+    client = skylab_studio.api('KEY', max_concurrent_downloads=5, max_download_bytes=60 * mb)
+    client.get_profile = lambda profile_id: skylab_studio.Profile({'id': profile_id, 'photos': []})
+    client.get_photo = lambda photo_id: skylab_studio.Photo({'name': f"{photo_id}.jpg", 'retouchedUrl': 'https://photos.test', 'job': {'profileId': 1}})
+
+    photos = [{'id': i} for i in range(12)]
+    results = asyncio.run(client.download_all_photos(photos, {'id': 1}, str(tmp_path)))
+
+    assert len(results['success_photos']) == 12
+    assert 24 * mb <= usage['peak'] <= 60 * mb
+
+    # a slow consumer must not keep written photos alive outside the budget
+    async def consume_slowly():
+        downloaded = []
+        async for result in client.iter_download_photos(photos, {'id': 1}, str(tmp_path)):
+            await asyncio.sleep(0.05)
+            downloaded.append(result)
+        return downloaded
+
+    usage['peak'] = 0
+    assert all(result.success for result in asyncio.run(consume_slowly()))
+    assert usage['peak'] <= 60 * mb
+
 def test_update_job(api):
     global job_id
     new_job_name = str(uuid.uuid4())
@@ -104,6 +363,50 @@ def test_delete_job(api):
     result = api.delete_job(job_id)
     assert result is not None
 
+def test_delete_jobs(api):
+    job_ids = [api.create_job(payload={'name': str(uuid.uuid4()), 'profile_id': 24})['id'] for _ in range(3)]
+
+    results = api.delete_jobs(job_ids)
+
+    assert sorted(results) == sorted(job_ids)
+    assert not any(isinstance(result, Exception) for result in results.values())
+
+def test_bulk_job_retries():
+    """ Test bulk results map every id once and only safe failures are retried. """
+    client = skylab_studio.api('KEY', api_url='https://studio.test')
+    jobs_url = 'https://studio.test/api/public/v1/jobs'
+    retried = [{'status_code': 429, 'json': {'message': 'slow down'}, 'headers': {'Retry-After': '0'}}, {'json': {'id': 1}}]
+
+    with requests_mock.Mocker() as mocker:
+        mocker.delete(f"{jobs_url}/1", retried)
+        mocker.delete(f"{jobs_url}/2", [{'status_code': 500, 'json': {'message': 'oops'}}, {'json': {'id': 2}}])
+        mocker.delete(f"{jobs_url}/3", status_code=404, json={'message': 'not found'})
+        results = client.delete_jobs(job_id for job_id in [1, 2, 3, 1])
+
+        assert list(results) == [1, 2, 3]
+        assert results[1]['id'] == 1
+        assert results[2]['id'] == 2
+        assert isinstance(results[3], NotFoundException)
+
+        mocker.post(f"{jobs_url}/1/queue", retried)
+        mocker.post(f"{jobs_url}/2/queue", [{'status_code': 500, 'json': {'message': 'oops'}}, {'json': {'id': 2}}])
+        mocker.post(f"{jobs_url}/3/queue", [{'exc': requests.exceptions.ConnectTimeout}, {'json': {'id': 3}}])
+        results = client.queue_jobs([1, 2, 3])
+
+        assert results[1]['id'] == 1
+        assert isinstance(results[2], ServerException)
+        assert results[3]['id'] == 3
+        assert len([r for r in mocker.request_history if r.url == f"{jobs_url}/2/queue"]) == 1
+
+        # waits longer than max_retry_wait are returned instead of slept through
+        mocker.post(f"{jobs_url}/4/cancel", status_code=429, json={'message': 'slow down'}, headers={'Retry-After': '3600'})
+        started = time.monotonic()
+        results = client.cancel_jobs([4], max_retry_wait=5)
+
+        assert time.monotonic() - started < 5
+        assert isinstance(results[4], RateLimitException)
+        assert results[4].retry_after == 3600
+
 
 def test_list_profiles(api):
     result = api.list_profiles()
@@ -141,6 +444,33 @@ def test_upload_profile_photo(api, pytestconfig):
     assert result['upload_response'] == 200
 
 
+def test_upload_photo_errors(pytestconfig):
+    """ Test photo creation errors keep the server's status, message and cause. """
+    client = skylab_studio.api('KEY', api_url='https://studio.test')
+    photo_path = f"{pytestconfig.rootdir}/test/test-portrait-1.JPG"
+
+    with requests_mock.Mocker() as mocker:
+        mocker.post('https://studio.test/api/public/v1/photos', status_code=422, json={'message': 'invalid profile'})
+        with pytest.raises(ValidationException) as error:
+            client.upload_profile_photo(photo_path, 1)
+
+        assert 'invalid profile' in error.value.message
+        assert 'enable_extract' in error.value.message
+        assert isinstance(error.value.__cause__, ValidationException)
+
+        mocker.post('https://studio.test/api/public/v1/photos', status_code=429, json={'message': 'slow down'}, headers={'Retry-After': '5'})
+        with pytest.raises(RateLimitException) as error:
+            client.upload_profile_photo(photo_path, 1)
+
+        assert error.value.message == 'slow down'
+        assert error.value.retry_after == 5
+
+        mocker.get('https://studio.test/api/public/v1/jobs/1', status_code=404, json={'message': 'not found'})
+        with pytest.raises(JobNotFoundException) as error:
+            client.upload_job_photo(photo_path, 1)
+
+        assert isinstance(error.value.__cause__, NotFoundException)
+
 def test_get_profile(api):
     global profile_id
     result = api.get_profile(profile_id)
@@ -161,6 +491,68 @@ def test_get_photo(api):
     result = api.get_photo(photo_id)
     assert result is not None
 
+def test_concurrent_requests(api):
+    """ Test a single client shared by a pool of threads. """
+    global job_id
+    global photo_id
+
+    def request(i):
+        return api.get_job(job_id) if i % 2 else api.get_photo(photo_id)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(request, range(32)))
+
+    assert all(result['id'] == job_id for result in results[1::2])
+    assert all(result['id'] == photo_id for result in results[0::2])
+
+def test_concurrent_requests_offline():
+    """ Test threads sharing a client each get one session, all on the client's connection pool. """
+    client = skylab_studio.api('KEY', api_url='https://studio.test', max_connections=8)
+    base_url = 'https://studio.test/api/public/v1'
+    sessions = {}
+    errors = []
+    lock = threading.Lock()
+    # keeps every worker alive until all of them made a request, so no thread id is reused
+    barrier = threading.Barrier(8)
+    thread_session = client._session
+
+    def session():
+        result = thread_session()
+        with lock:
+            sessions.setdefault(threading.get_ident(), set()).add(result)
+        return result
+
+    client._session = session
+
+    def worker(n):
+        try:
+            for i in range(20):
+                item_id = n * 100 + i
+                result = client.get_job(item_id) if i % 2 else client.get_photo(item_id)
+                assert isinstance(result, skylab_studio.Job if i % 2 else skylab_studio.Photo)
+                assert result['id'] == item_id
+        except Exception as e:
+            errors.append(e)
+        finally:
+            barrier.wait()
+
+    with requests_mock.Mocker() as mocker:
+        mocker.get(requests_mock.ANY, json=lambda request, context: {'id': int(request.path.rsplit('/', 1)[1])})
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert errors == []
+    assert len(sessions) == 8
+    assert all(len(thread_sessions) == 1 for thread_sessions in sessions.values())
+
+    all_sessions = set.union(*sessions.values())
+    assert len(all_sessions) == 8
+    assert all(session.adapters['https://'] is client._adapter for session in all_sessions)
+
 def test_delete_photo(api):
     global photo_id
     result = api.delete_photo(photo_id)